@@ -38,6 +38,11 @@ extensions = [
         include_dirs=[np.get_include()],
         language="c++",
     ),
+    Extension(
+        "stcal.resample._utils",
+        ["src/stcal/resample/_utils.pyx"],
+        include_dirs=[np.get_include()],
+    ),
     Extension(
         "stcal.ramp_fitting.slope_fitter",
         ["src/stcal/ramp_fitting/src/slope_fitter.c"],
@@ -837,7 +837,7 @@ def find_faint_extended(
     if nints >= jump_data.minimum_sigclip_groups:
         mean, median, stddev = stats.sigma_clipped_stats(first_diffs, sigma=5, axis=0)
     else:
-        median_diffs = np.nanmedian(first_diffs, axis=(0, 1))
+        median_diffs = twopt.nanmedian_groups(first_diffs)
         sigma = np.sqrt(np.abs(median_diffs) + read_noise_2 / jump_data.nframes)
 
     for intg in range(nints):
@@ -977,12 +977,9 @@ def count_dnu_groups(gdq, jump_data):
     num_grps_donotuse : int
         The number of groups flagged as DO_NOT_USE.
     """
-    nints, ngrps = gdq.shape[:2]
-    num_grps_donotuse = 0
-    for integ in range(nints):
-        for grp in range(ngrps):
-            if np.all(np.bitwise_and(gdq[integ, grp, :, :], jump_data.fl_dnu)):
-                num_grps_donotuse += 1
+    # count the fully flagged groups with a single whole-cube reduction
+    dnu_mask = np.bitwise_and(gdq, jump_data.fl_dnu).astype(bool)
+    num_grps_donotuse = int(dnu_mask.all(axis=(2, 3)).sum())
     return num_grps_donotuse
 
 
@@ -1277,11 +1274,13 @@ def nan_invalid_data(data, gdq, jump_data):
     """
     jump_dnu_flag = jump_data.fl_jump + jump_data.fl_dnu
     sat_dnu_flag = jump_data.fl_sat + jump_data.fl_dnu
-    data[gdq == jump_dnu_flag] = np.nan
-    data[gdq == sat_dnu_flag] = np.nan
-    data[gdq == jump_data.fl_sat] = np.nan
-    data[gdq == jump_data.fl_jump] = np.nan
-    data[gdq == jump_data.fl_dnu] = np.nan
+
+    # Build one boolean mask and write the NaNs in a single pass over
+    # the science data instead of one masked assignment per flag value.
+    invalid = gdq == jump_dnu_flag
+    for flag in (sat_dnu_flag, jump_data.fl_sat, jump_data.fl_jump, jump_data.fl_dnu):
+        invalid |= gdq == flag
+    data[invalid] = np.nan
 
     return data
 
@@ -6,9 +6,59 @@ import warnings
 from astropy import stats
 from astropy.utils.exceptions import AstropyUserWarning
 
+try:
+    import bottleneck as bn
+    HAS_BOTTLENECK = True
+except ImportError:
+    HAS_BOTTLENECK = False
+
+# Single-axis NaN-aware reductions.  Bottleneck's implementations are C
+# strided loops that are several times faster than NumPy's NaN-aware
+# reductions; fall back to NumPy when bottleneck is not installed.
+if HAS_BOTTLENECK:
+    _nanmedian, _nanmax, _nanmin = bn.nanmedian, bn.nanmax, bn.nanmin
+else:
+    _nanmedian, _nanmax, _nanmin = np.nanmedian, np.nanmax, np.nanmin
+
 log = logging.getLogger(__name__)
 log.setLevel(logging.DEBUG)
 
+# Number of rows processed per tile in run_jump_detection.  Chosen so the
+# per-tile working set (diffs, finite mask, and detection temporaries)
+# stays cache resident across the diff/median/sigma/threshold sequence.
+TILE_ROWS = 64
+
+
+def nanmedian_groups(arr):
+    """
+    Compute the NaN-aware median over the integration and group axes.
+
+    The first two axes of ``arr`` are collapsed into one and reduced with
+    ``bottleneck.nanmedian`` when bottleneck is importable, falling back to
+    ``np.nanmedian`` otherwise.  Bottleneck reduces along a single axis in
+    a C strided loop, which is much faster than NumPy's tuple-axis
+    NaN-aware reduction.
+
+    Parameters
+    ----------
+    arr : ndarray
+        Array of at least two dimensions; the median is taken over the
+        first two axes jointly.
+
+    Returns
+    -------
+    median : ndarray
+        Median of ``arr`` over its first two axes, ignoring NaNs.
+    """
+    collapsed = arr.reshape(-1, *arr.shape[2:])
+    if collapsed.ndim > 2 and collapsed.flags.c_contiguous:
+        # Flatten the pixel axes as well so bottleneck reduces a plain
+        # 2D array; only done when the reshape is a free view, since a
+        # contiguous copy costs more than it saves.
+        result = _nanmedian(collapsed.reshape(collapsed.shape[0], -1), axis=0)
+        return result.reshape(arr.shape[2:])
+    return _nanmedian(collapsed, axis=0)
+
 
 def find_crs(dataa, group_dq, read_noise, twopt_p):
     """
@@ -174,36 +224,76 @@ def run_jump_detection(
     sigma : ndarray
         The sigma for each pixel.
     """
-    # set 'saturated' or 'do not use' pixels to nan in data
-    dat[gdq & (twopt_p.fl_dnu | twopt_p.fl_sat) != 0] = np.nan
-    
-    # calculate the differences between adjacent groups (first diffs)
-    # Bad data will be NaN; np.nanmedian will be used later.
-    first_diffs = np.diff(dat, axis=1)
-    first_diffs_finite = np.isfinite(first_diffs)
-    
-    # calc. the median of first_diffs for each pixel along the group axis
-    with warnings.catch_warnings():
-        warnings.filterwarnings("ignore", ".*All-NaN slice encountered.*", RuntimeWarning)
-        median_diffs = np.nanmedian(first_diffs, axis=(0, 1))
-
-    # calculate sigma for each pixel
-    sigma = np.sqrt(np.abs(median_diffs) + read_noise_2 / twopt_p.nframes)
-
-    # reset sigma so pxels with 0 readnoise are not flagged as jumps
-    sigma[sigma == 0.] = np.nan
-
-    # Test to see if there are enough groups to use sigma clipping
+    # Work in row tiles so the diff, median, sigma and threshold steps
+    # all run while a tile is still cache resident.  Every step below is
+    # independent per pixel, so tiling does not change the results; the
+    # one whole-frame operation in the sigma-clip branch is deferred
+    # until after the tile loop.
+    nrows, ncols = dat.shape[2:]
+
+    first_diffs = np.empty((nints, ngroups - 1, nrows, ncols), dtype=dat.dtype)
+    first_diffs_finite = np.empty(first_diffs.shape, dtype=bool)
+    median_diffs = None
+    sigma = None
     stddev = None
-    if (check_sigma_clip_groups(nints, total_groups, twopt_p)):
-        gdq, stddev = det_jump_sigma_clipping(
-            gdq, nints, ngroups, total_groups, first_diffs_finite, first_diffs, twopt_p)
-    else:  # There are not enough groups for sigma clipping
-        if min_usable_diffs >= twopt_p.min_diffs_single_pass:
-            gdq = look_for_more_than_one_jump(
-                gdq, nints, first_diffs, median_diffs, sigma, first_diffs_finite, twopt_p) 
+
+    # Test to see if there are enough groups to use sigma clipping.
+    # The branch tests depend only on whole-exposure group counts, so
+    # the choice is hoisted out of the tile loop.
+    use_sigma_clip = check_sigma_clip_groups(nints, total_groups, twopt_p)
+    if use_sigma_clip:
+        log.info(" Jump Step using sigma clip {} greater than {}, rejection threshold {}".format(
+            str(total_groups), str(twopt_p.minimum_sigclip_groups), str(twopt_p.normal_rej_thresh)))
+
+    for r0 in range(0, nrows, TILE_ROWS):
+        r1 = min(r0 + TILE_ROWS, nrows)
+
+        # set 'saturated' or 'do not use' pixels to nan in data
+        dat_t = dat[:, :, r0:r1]
+        gdq_t = gdq[:, :, r0:r1]
+        dat_t[gdq_t & (twopt_p.fl_dnu | twopt_p.fl_sat) != 0] = np.nan
+
+        # calculate the differences between adjacent groups (first diffs)
+        # Bad data will be NaN; np.nanmedian will be used later.
+        first_diffs_t = first_diffs[:, :, r0:r1]
+        np.subtract(dat_t[:, 1:], dat_t[:, :-1], out=first_diffs_t)
+        finite_t = first_diffs_finite[:, :, r0:r1]
+        np.isfinite(first_diffs_t, out=finite_t)
+
+        # calc. the median of first_diffs for each pixel along the group axis
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", ".*All-NaN slice encountered.*", RuntimeWarning)
+            median_t = nanmedian_groups(first_diffs_t)
+
+        # calculate sigma for each pixel
+        sigma_t = np.sqrt(np.abs(median_t) + read_noise_2[r0:r1] / twopt_p.nframes)
+
+        # reset sigma so pxels with 0 readnoise are not flagged as jumps
+        sigma_t[sigma_t == 0.] = np.nan
+
+        if median_diffs is None:
+            median_diffs = np.empty((nrows, ncols), dtype=median_t.dtype)
+            sigma = np.empty((nrows, ncols), dtype=sigma_t.dtype)
+        median_diffs[r0:r1] = median_t
+        sigma[r0:r1] = sigma_t
+
+        if use_sigma_clip:
+            stddev_t = det_jump_sigma_clipping(gdq_t, finite_t, first_diffs_t, twopt_p)
+            if stddev is None:
+                stddev_shape = list(stddev_t.shape)
+                stddev_shape[-2] = nrows
+                stddev = np.empty(stddev_shape, dtype=stddev_t.dtype)
+            stddev[..., r0:r1, :] = stddev_t
+        elif min_usable_diffs >= twopt_p.min_diffs_single_pass:
+            look_for_more_than_one_jump(
+                gdq_t, nints, first_diffs_t, median_t, sigma_t, finite_t, twopt_p)
         else:  # low number of diffs requires iterative flagging
-            gdq = iterative_jump(gdq, ndiffs, first_diffs, read_noise_2, twopt_p)
+            iterative_jump(gdq_t, ndiffs, first_diffs_t, read_noise_2[r0:r1], twopt_p)
+
+    if use_sigma_clip:
+        # if grp is all jump set to do not use; this needs full rows, so
+        # it runs once all tiles have been flagged.
+        reset_jump_only_groups(gdq, twopt_p)
 
     return gdq, first_diffs, median_diffs, sigma, stddev
 
@@ -234,8 +324,20 @@ def iterative_jump(gdq, ndiffs, first_diffs, read_noise_2, twopt_p):
     # Do not overwrite first_diffs, median_diffs, sigma.
     first_diffs_abs = np.abs(first_diffs)
 
-    cr_pix, ratio = get_cr_locs(
-        first_diffs_abs, read_noise_2, ndiffs, twopt_p) 
+    # Workspace for the jump ratios, reused by every call to
+    # get_cr_locs so the iteration does not reallocate a full-size
+    # array each pass.
+    ratio_buf = np.zeros(first_diffs_abs.shape, dtype=np.float32)
+
+    # Running count of usable diffs per pixel.  Each flagged CR masks
+    # exactly one previously finite diff, so the count is decremented
+    # in the loop rather than rescanning the full cube for NaNs on
+    # every iteration.
+    num_usable_grps = ndiffs - np.sum(np.isnan(first_diffs_abs), axis=(0, 1))
+
+    cr_pix, ratio, max_ratio = get_cr_locs(
+        first_diffs_abs, read_noise_2, ndiffs, twopt_p, out=ratio_buf,
+        num_usable_grps=num_usable_grps)
 
     # Iterate over all groups and integrations: flag and clip the
     # first CR found for each pixel (if any), then recompute medians
@@ -245,8 +347,10 @@ def iterative_jump(gdq, ndiffs, first_diffs, read_noise_2, twopt_p):
     for i in range(ndiffs): # Can't have more than ndiffs CRs per pixel!
 
         warnings.filterwarnings("ignore", ".*All-NaN slice encountered.*", RuntimeWarning)
-        # Newly flagged jump locations
-        new_cr = (ratio == np.nanmax(ratio, axis=(0, 1))) & cr_pix[:, np.newaxis]        
+        # Newly flagged jump locations.  Reduce the per-integration
+        # maxima from get_cr_locs instead of re-reducing the full 4D
+        # ratio array.
+        new_cr = (ratio == _nanmax(max_ratio, axis=0)) & cr_pix[:, np.newaxis]
         warnings.resetwarnings()
 
         # No new jumps: we are done.
@@ -254,18 +358,22 @@ def iterative_jump(gdq, ndiffs, first_diffs, read_noise_2, twopt_p):
             break
 
         # Add these jumps to the gdq array, and mask those differences.
-        gdq[:, 1:][new_cr] |= twopt_p.fl_jump
+        np.bitwise_or(gdq[:, 1:], twopt_p.fl_jump, out=gdq[:, 1:], where=new_cr)
         first_diffs_abs[new_cr] = np.nan
+        num_usable_grps -= new_cr.sum(axis=(0, 1))
 
         # Look for more jumps! We only need to check pixels that had a
         # CR flagged in this iteration.
-        cr_pix, ratio = get_cr_locs(first_diffs_abs, read_noise_2, ndiffs,
-                                    twopt_p, index=np.any(new_cr, axis=(0, 1)))
+        cr_pix, ratio, max_ratio = get_cr_locs(first_diffs_abs, read_noise_2, ndiffs,
+                                               twopt_p, index=np.any(new_cr, axis=(0, 1)),
+                                               out=ratio_buf,
+                                               num_usable_grps=num_usable_grps)
         
     return gdq
 
 
-def get_cr_locs(first_diffs_abs, read_noise_2, ndiffs, twopt_p, index=None):
+def get_cr_locs(first_diffs_abs, read_noise_2, ndiffs, twopt_p, index=None, out=None,
+                num_usable_grps=None):
     """
     Compute the pairs of rows and columns with cosmic rays.
 
@@ -282,6 +390,13 @@ def get_cr_locs(first_diffs_abs, read_noise_2, ndiffs, twopt_p, index=None):
     index : ndarray, bool or None
         Boolean index of pixels that require checking.  If None,
         check all pixels. Default None.
+    out : ndarray or None
+        Preallocated float32 array the shape of first_diffs_abs used
+        as workspace for the ratios.  If None, a new array is
+        allocated. Default None.
+    num_usable_grps : ndarray or None
+        Per-pixel count of usable (non-NaN) diffs.  If None, it is
+        computed from first_diffs_abs. Default None.
 
     Returns
     -------
@@ -289,6 +404,8 @@ def get_cr_locs(first_diffs_abs, read_noise_2, ndiffs, twopt_p, index=None):
         Boolean index of pixels with at least one jump
     ratio : ndarray
         Used for threshold comparison
+    max_ratio : ndarray
+        The largest ratio for each pixel and each integration
     """
 
     nints, ndiffs_int, nrows, ncols = first_diffs_abs.shape
@@ -314,27 +431,36 @@ def get_cr_locs(first_diffs_abs, read_noise_2, ndiffs, twopt_p, index=None):
     # by sigma.  If index is supplied, use zero for pixels not in
     # index (so that no CR will be found in that pixel).
 
-    e_jump = np.zeros(first_diffs_abs.shape, dtype=np.float32)
+    if out is None:
+        e_jump = np.zeros(first_diffs_abs.shape, dtype=np.float32)
+    else:
+        e_jump = out
+        e_jump.fill(0.0)
     e_jump[:, :, index] = first_diffs_abs[:, :, index] - median_diffs_iter[index]
-    ratio = np.abs(e_jump) / sigma_iter[np.newaxis, :, :]
+    # Finish the ratio in place instead of allocating two more
+    # full-size temporaries.
+    np.abs(e_jump, out=e_jump)
+    e_jump /= sigma_iter[np.newaxis, :, :]
+    ratio = e_jump
 
     # create a 2d array containing the value of the largest 'ratio'
     # for each pixel and each integration.
     warnings.filterwarnings("ignore", ".*All-NaN slice encountered.*", RuntimeWarning)
-    max_ratio = np.nanmax(ratio, axis=1)
+    max_ratio = _nanmax(ratio, axis=1)
     warnings.resetwarnings()
     # now see if the largest ratio of all groups for each pixel
     # exceeds the threshold. There are different threshold for 4+, 3,
     # and 2 usable groups
 
-    num_usable_grps = ndiffs - np.sum(np.isnan(first_diffs_abs), axis=(0, 1))
+    if num_usable_grps is None:
+        num_usable_grps = ndiffs - np.sum(np.isnan(first_diffs_abs), axis=(0, 1))
     fourgrp_cr = (num_usable_grps >= 4) & (max_ratio > twopt_p.normal_rej_thresh)
     threegrp_cr = (num_usable_grps == 3) & (max_ratio > twopt_p.three_diff_rej_thresh)
     twogrp_cr = (num_usable_grps == 2) & (max_ratio > twopt_p.two_diff_rej_thresh)
     # Get a boolean array labeling pixels with at least one CR
     cr_pixel = fourgrp_cr | threegrp_cr | twogrp_cr
-    
-    return cr_pixel, ratio
+
+    return cr_pixel, ratio, max_ratio
 
 
 def look_for_more_than_one_jump(
@@ -371,78 +497,89 @@ def look_for_more_than_one_jump(
     # first_diffs from first_diffs, take the abs. value and divide by sigma.
     # The jump mask is the ratio greater than the threshold and the
     # difference is usable.  Loop over integrations to minimize the memory
-    # footprint.
-    jump_mask = np.zeros(first_diffs.shape, dtype=bool)
+    # footprint, reusing one ratio buffer and chaining the arithmetic
+    # in place so no per-integration temporaries are allocated.
+    ratio = np.empty(first_diffs.shape[1:], dtype=np.result_type(first_diffs, sigma))
     for i in range(nints):
-        absdiff = np.abs(first_diffs[i] - median_diffs[np.newaxis, :])
-        ratio = absdiff / sigma[np.newaxis, :]
+        np.subtract(first_diffs[i], median_diffs[np.newaxis, :], out=ratio)
+        np.abs(ratio, out=ratio)
+        ratio /= sigma[np.newaxis, :]
         jump_candidates = ratio > twopt_p.normal_rej_thresh
         jump_mask = jump_candidates & first_diffs_finite[i]
-        gdq[i, 1:] |= jump_mask * np.uint8(twopt_p.fl_jump)
+        np.bitwise_or(gdq[i, 1:], twopt_p.fl_jump, out=gdq[i, 1:], where=jump_mask)
     return gdq
 
 
 # XXX develop CI test for this function.
-def det_jump_sigma_clipping(
-    gdq, nints, ngroups, total_groups, first_diffs_finite, first_diffs, twopt_p
-):
+def det_jump_sigma_clipping(gdq, first_diffs_finite, first_diffs, twopt_p):
     """
     Detect jumps using sigma clipping.
 
+    The clipping is independent per pixel, so this can be called on row
+    tiles; resetting groups that came out all jump is a whole-frame
+    operation handled afterwards by ``reset_jump_only_groups``.
+
     Parameters
     ----------
     gdq : ndarray
-        The group DQ array.
-    nints : int
-        The number of integrations in an exposure.
-    ngroups : int
-        The number of groups in an integration
-    total_groups : int
-        Total usable groups to check.
+        The group DQ array, updated in place.
     first_diffs_finite : ndarray
         A boolean array where the first diffs are finite.
     first_diffs : ndarray
         The first differences of the groups.
-    twopt_p : TwoPointParams 
+    twopt_p : TwoPointParams
         Class containing two point difference parameters.
 
     Returns
     -------
-    gdq : ndarray
-        Flagged group DQ array.
+    stddev : ndarray
+        Standard deviation computed from the sigma clipping bounds.
     """
-    log.info(" Jump Step using sigma clip {} greater than {}, rejection threshold {}".format(
-        str(total_groups), str(twopt_p.minimum_sigclip_groups), str(twopt_p.normal_rej_thresh)))
     warnings.filterwarnings("ignore", ".*All-NaN slice encountered.*", RuntimeWarning)
     warnings.filterwarnings("ignore", ".*Mean of empty slice.*", RuntimeWarning)
     warnings.filterwarnings("ignore", ".*Degrees of freedom <= 0.*", RuntimeWarning)
     warnings.filterwarnings("ignore", ".*Input data contains invalid values*", AstropyUserWarning)
 
+    # first_diffs already uses NaN as its only bad-data sentinel, so ask
+    # sigma_clip for a plain ndarray with clipped values set to NaN
+    # rather than a masked array; this skips the masked-array machinery
+    # (and its full-size mask allocation) inside astropy.
     axis = 0 if twopt_p.only_use_ints else (0, 1)
     clipped_diffs, alow, ahigh = stats.sigma_clip(
         first_diffs, sigma=twopt_p.normal_rej_thresh,
-        axis=axis, masked=True, return_bounds=True)
+        axis=axis, masked=False, return_bounds=True)
 
     # get the standard deviation from the bounds of sigma clipping
     stddev = 0.5 * (ahigh - alow) / twopt_p.normal_rej_thresh
-    jump_candidates = clipped_diffs.mask
+    jump_candidates = np.isnan(clipped_diffs)
     sat_or_dnu_not_set = gdq[:, 1:] & (twopt_p.fl_sat | twopt_p.fl_dnu) == 0
     jump_mask = jump_candidates & first_diffs_finite & sat_or_dnu_not_set
     del clipped_diffs
-    gdq[:, 1:] |= jump_mask * np.uint8(twopt_p.fl_jump)
+    # Set the jump flag with a masked in-place OR; no scaled copy of the
+    # mask is allocated.
+    np.bitwise_or(gdq[:, 1:], twopt_p.fl_jump, out=gdq[:, 1:], where=jump_mask)
 
-    # if grp is all jump set to do not use
-    for integ in range(nints):
-        for grp in range(ngroups):
-            if np.all(gdq[integ, grp] & (twopt_p.fl_jump | twopt_p.fl_dnu) != 0):
-                # The line below matches the comment above, but not the
-                # old logic.  Leaving it for now.
-                #gdq[integ, grp] |= twopt_p.fl_dnu
-                jump_only = gdq[integ, grp, :, :] == twopt_p.fl_jump
-                gdq[integ, grp][jump_only] = 0
-                
     warnings.resetwarnings()
-    return gdq, stddev
+    return stddev
+
+
+def reset_jump_only_groups(gdq, twopt_p):
+    """
+    Clear jump flags in groups where every pixel came out jump or do not use.
+
+    Parameters
+    ----------
+    gdq : ndarray
+        The group DQ array, updated in place.
+    twopt_p : TwoPointParams
+        Class containing two point difference parameters.
+    """
+    # if grp is all jump set to do not use
+    # The comment above describes ORing in fl_dnu, which does not match
+    # the old logic; keeping the old logic for now.
+    allbad = (gdq & (twopt_p.fl_jump | twopt_p.fl_dnu) != 0).all(axis=(2, 3))
+    jump_only = (gdq == twopt_p.fl_jump) & allbad[:, :, np.newaxis, np.newaxis]
+    gdq[jump_only] = 0
 
 
 def check_sigma_clip_groups(nints, total_groups, twopt_p):
@@ -504,24 +641,26 @@ def flag_four_neighbors(
     row_above_gdq : ndarray
         Pixels above current row also to be flagged as a CR.
     """
+    # Loop over integrations only to bound the memory footprint; the
+    # group axis is handled by whole-array shifts below.
     for i in range(nints):
-        for j in range(ngroups - 1):
-            ratio = np.abs(first_diffs[i, j] - median_diffs)/sigma
-            jump_set = gdq[i, j + 1] & twopt_p.fl_jump != 0
-            flag = (ratio < twopt_p.max_jump_to_flag_neighbors) & \
-                (ratio > twopt_p.min_jump_to_flag_neighbors) & \
-                (jump_set)
-
-            # Dilate the flag by one pixel in each direction.
-            flagsave = flag.copy()
-            flag[1:] |= flagsave[:-1]
-            flag[:-1] |= flagsave[1:]
-            flag[:, 1:] |= flagsave[:, :-1]
-            flag[:, :-1] |= flagsave[:, 1:]
-            sat_or_dnu_notset = gdq[i, j + 1] & (twopt_p.fl_sat | twopt_p.fl_dnu) == 0
-            gdq[i, j + 1][sat_or_dnu_notset & flag] |= twopt_p.fl_jump
-            row_below_gdq[i, j + 1][flagsave[0]] = twopt_p.fl_jump
-            row_above_gdq[i, j + 1][flagsave[-1]] = twopt_p.fl_jump
+        ratio = np.abs(first_diffs[i] - median_diffs[np.newaxis, :]) / sigma[np.newaxis, :]
+        jump_set = gdq[i, 1:] & twopt_p.fl_jump != 0
+        flag = (ratio < twopt_p.max_jump_to_flag_neighbors) & \
+            (ratio > twopt_p.min_jump_to_flag_neighbors) & \
+            (jump_set)
+
+        # Dilate the flag by one pixel in each direction.
+        flagsave = flag.copy()
+        flag[:, 1:] |= flagsave[:, :-1]
+        flag[:, :-1] |= flagsave[:, 1:]
+        flag[:, :, 1:] |= flagsave[:, :, :-1]
+        flag[:, :, :-1] |= flagsave[:, :, 1:]
+        sat_or_dnu_notset = gdq[i, 1:] & (twopt_p.fl_sat | twopt_p.fl_dnu) == 0
+        np.bitwise_or(gdq[i, 1:], twopt_p.fl_jump, out=gdq[i, 1:],
+                      where=sat_or_dnu_notset & flag)
+        row_below_gdq[i, 1:][flagsave[:, 0]] = twopt_p.fl_jump
+        row_above_gdq[i, 1:][flagsave[:, -1]] = twopt_p.fl_jump
 
     return gdq, row_below_gdq, row_above_gdq
 
@@ -546,15 +685,21 @@ def transient_jumps(gdq, nints, first_diffs, median_diffs, twopt_p):
     gdq : ndarray
         The group DQ array.
     """
+    # Allocate the per-integration work arrays once and refill them on
+    # each pass through the loop.
+    ejump = np.empty(first_diffs.shape[1:],
+                     dtype=np.result_type(first_diffs, median_diffs))
+    bigjump = np.zeros(gdq.shape[1:], dtype=bool)
+    verybigjump = np.zeros(gdq.shape[1:], dtype=bool)
+
     for i in range(nints):
-        ejump = first_diffs[i] - median_diffs[np.newaxis, :]
+        np.subtract(first_diffs[i], median_diffs[np.newaxis, :], out=ejump)
         jump_set = gdq[i] & twopt_p.fl_jump != 0
 
-        bigjump = np.zeros(jump_set.shape, dtype=bool)
-        verybigjump = np.zeros(jump_set.shape, dtype=bool)
-
-        bigjump[1:] = (ejump >= twopt_p.after_jump_flag_e1) & jump_set[1:]
-        verybigjump[1:] = (ejump >= twopt_p.after_jump_flag_e2) & jump_set[1:]
+        np.logical_and(ejump >= twopt_p.after_jump_flag_e1, jump_set[1:],
+                       out=bigjump[1:])
+        np.logical_and(ejump >= twopt_p.after_jump_flag_e2, jump_set[1:],
+                       out=verybigjump[1:])
 
         # Propagate flags forward
         propagate_flags(bigjump, twopt_p.after_jump_flag_n1)
@@ -564,7 +709,7 @@ def transient_jumps(gdq, nints, first_diffs, median_diffs, twopt_p):
         # already flagged as saturated or do not use.
         sat_or_dnu_notset = gdq[i] & (twopt_p.fl_sat | twopt_p.fl_dnu) == 0
         addflag = (bigjump | verybigjump) & sat_or_dnu_notset
-        gdq[i][addflag] |= twopt_p.fl_jump
+        np.bitwise_or(gdq[i], twopt_p.fl_jump, out=gdq[i], where=addflag)
 
     return gdq
 
@@ -614,20 +759,16 @@ def groups_all_set_dnu(nints, ngroups, gdq, twopt_p):
     ngroups_ans : tuple
         Various group totals.
     """
-    # get data, gdq
-    num_flagged_grps = 0
-
     # determine the number of groups with all pixels set to DO_NOT_USE
-    max_flagged_grps = 0
-    total_flagged_grps = 0
-    for integ in range(nints):
-        num_flagged_grps = 0
-        for grp in range(ngroups):
-            if np.all(np.bitwise_and(gdq[integ, grp, :, :], twopt_p.fl_dnu)):
-                num_flagged_grps += 1
-        if num_flagged_grps > max_flagged_grps:
-            max_flagged_grps = num_flagged_grps
-        total_flagged_grps += num_flagged_grps
+    # with a single whole-cube reduction
+    flagged_grps = np.bitwise_and(gdq, twopt_p.fl_dnu).astype(bool).all(axis=(2, 3))
+    flagged_per_int = flagged_grps.sum(axis=1)
+
+    # matches the old loop, which left this holding the count for the
+    # final integration
+    num_flagged_grps = int(flagged_per_int[-1])
+    max_flagged_grps = int(flagged_per_int.max())
+    total_flagged_grps = int(flagged_per_int.sum())
     if twopt_p.only_use_ints:
         total_sigclip_groups = nints
     else:
@@ -669,15 +810,19 @@ def set_up_data(dataa, group_dq, read_noise, twopt_p):
     read_noise_2 : ndarray
         The square of the read noise reference array.
     """
+    # Force the science data to float32 so every downstream temporary
+    # (diffs, medians, sigmas, ratios) stays at 4 bytes per element.
+    dat = np.asarray(dataa, dtype=np.float32)
+
     # copy data and group DQ array
     if twopt_p.copy_arrs:
-        dat = dataa.copy()
+        if dat is dataa:
+            dat = dataa.copy()
         gdq = group_dq.copy()
     else:
-        dat = dataa
         gdq = group_dq
 
-    read_noise_2 = read_noise**2
+    read_noise_2 = read_noise.astype(np.float32, copy=False)**2
 
     return dat, gdq, read_noise_2
 
@@ -700,12 +845,17 @@ def propagate_flags(boolean_flag, n_groups_flag):
     """
     ngroups = boolean_flag.shape[0]
     jmax = min(n_groups_flag, ngroups - 2)
-    # Option A: iteratively propagate all flags forward by one
-    # group at a time.  Do this unless we have a lot of groups
-    # and cosmic rays are rare.
+    # Option A: propagate the flags forward with a doubling scan: a
+    # shift of s extends a window already dilated to w groups to w + s,
+    # so the full window takes O(log jmax) array passes instead of
+    # jmax.  Do this unless we have a lot of groups and cosmic rays
+    # are rare.
     if (jmax <= 50 and jmax > 0) or np.mean(boolean_flag) > 1e-3:
-        for j in range(jmax):
-            boolean_flag[j + 1:] |= boolean_flag[j:-1]
+        window = 0
+        while window < jmax:
+            shift = min(window + 1, jmax - window)
+            boolean_flag[shift:] |= boolean_flag[:-shift]
+            window += shift
     # Option B: find the flags and propagate them individually.
     elif jmax > 0:
         igrp, icol, irow = np.where(boolean_flag)
@@ -742,9 +892,12 @@ def calc_med_first_diffs(in_first_diffs):
     """
     
     # We will modify our copy of first_diffs by setting some pixels to NaN.
-    first_diffs = in_first_diffs.copy()
-    nints, ndiffs = first_diffs.shape[:2]
-    num_usable_diffs = (ndiffs * nints) - np.sum(np.isnan(first_diffs), axis=(0, 1))
+    # Collapse the integration and group axes into one so that every
+    # reduction below runs along a single leading axis, which is much
+    # cheaper than the tuple-axis NaN-aware reductions.
+    nints, ndiffs = in_first_diffs.shape[:2]
+    first_diffs = in_first_diffs.reshape(-1, *in_first_diffs.shape[2:]).copy()
+    num_usable_diffs = (ndiffs * nints) - np.sum(np.isnan(first_diffs), axis=0)
 
     # Boolean arrays for the number of usable differences
     fourgrps = num_usable_diffs >= 4
@@ -754,15 +907,18 @@ def calc_med_first_diffs(in_first_diffs):
     warnings.filterwarnings("ignore", ".*All-NaN slice encountered.*", RuntimeWarning)
 
     # Four or more usable diffs: mask the largest difference.
-    maxval = np.nanmax(first_diffs, axis=(0, 1))        
+    maxval = _nanmax(first_diffs, axis=0)
     first_diffs[fourgrps & (first_diffs == maxval)] = np.nan
-    
+
     # Three or more usable diffs: take the median
-    median_diffs = np.nanmedian(first_diffs, axis=(0, 1))
+    median_diffs = _nanmedian(first_diffs, axis=0)
+
+    # Two usable diffs: take the minimum.  Only the pixels with exactly
+    # two usable diffs need this pass; the max-masking above did not
+    # touch them, so the collapsed columns still hold the original data.
+    if np.any(twogrps):
+        median_diffs[twogrps] = _nanmin(first_diffs[:, twogrps], axis=0)
 
-    # Two usable diffs: take the minimum
-    median_diffs[twogrps] = np.nanmin(first_diffs, axis=(0, 1))[twogrps]
-    
     # Fewer than two usable diffs: can't do anything.
     median_diffs[lessthantwogrps] = np.nan
 
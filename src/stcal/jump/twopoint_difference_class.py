@@ -18,7 +18,7 @@ class TwoPointParams:
 
             self.two_diff_rej_thresh = jump_data.three_grp_thresh
             self.three_diff_rej_thresh = jump_data.four_grp_thresh
-            self.nframes = jump_data.nframes,
+            self.nframes = float(jump_data.nframes)
                 
             self.flag_4_neighbors = jump_data.flag_4_neighbors
             self.max_jump_to_flag_neighbors = jump_data.max_jump_to_flag_neighbors
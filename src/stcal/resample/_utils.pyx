@@ -0,0 +1,123 @@
+# cython: language_level=3str
+
+"""
+Cython kernels for `stcal.resample.utils`.
+
+(Public) Functions
+------------------
+build_mask_u32 : function
+    Fused bitwise-AND + zero-test kernel producing a uint8 good-pixel
+    mask from a flattened uint32 DQ array in a single pass.
+
+clip_bbox : function
+    Clamp a bounding box to the pixel grid of a 2D array in C, without
+    the GIL.
+"""
+
+import numpy as np
+
+cimport cython
+cimport numpy as cnp
+
+cnp.import_array()
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def build_mask_u32(const cnp.uint32_t[::1] dq, cnp.uint32_t mask_inv):
+    """
+    Compute a good-pixel mask from a uint32 DQ array.
+
+    An element is good (1) when it has no bits in common with
+    ``mask_inv``, the complement of the good bits.  The AND, the zero
+    test and the uint8 store run in one C loop, so no intermediate
+    arrays are allocated and the data is read exactly once.
+
+    Parameters
+    ----------
+    dq : ndarray[uint32]
+        Flattened, contiguous DQ array.
+    mask_inv : uint32
+        Bitwise complement of the good-bits value.
+
+    Returns
+    -------
+    out : ndarray[uint8]
+        Flattened mask; 1 is good, 0 is bad.
+    """
+    cdef Py_ssize_t i
+    cdef Py_ssize_t n = dq.shape[0]
+
+    out_arr = np.empty(n, dtype=np.uint8)
+    cdef cnp.uint8_t[::1] out = out_arr
+
+    with nogil:
+        for i in range(n):
+            out[i] = (dq[i] & mask_inv) == 0
+
+    return out_arr
+
+
+cpdef (Py_ssize_t, Py_ssize_t, Py_ssize_t, Py_ssize_t) clip_bbox(
+        Py_ssize_t ny, Py_ssize_t nx,
+        double x1, double x2, double y1, double y2) noexcept nogil:
+    """
+    Clamp a bounding box to the pixel grid of an (ny, nx) array.
+
+    Matches the rounding of the original Python code: each limit is
+    rounded with ``int(v + 0.5)`` (truncation toward zero) and the
+    maxima are clamped so that ``xmax >= xmin`` and ``ymax >= ymin``.
+
+    Parameters
+    ----------
+    ny, nx : int
+        Shape of the data array.
+    x1, x2, y1, y2 : float
+        Bounding box limits, ``((x1, x2), (y1, y2))``.
+
+    Returns
+    -------
+    xmin, xmax, ymin, ymax : int
+        Clamped integer pixel limits.
+    """
+    cdef Py_ssize_t xmin, xmax, ymin, ymax
+    cdef double v
+
+    # Clamp in double space first: casting a double outside the
+    # Py_ssize_t range to an integer is undefined behavior in C, so
+    # the casts below must only ever see in-range values.
+    v = x1 + 0.5
+    if v < 0.0:
+        xmin = 0
+    elif v > <double>(nx - 1):
+        xmin = nx - 1
+    else:
+        xmin = <Py_ssize_t>v
+    v = y1 + 0.5
+    if v < 0.0:
+        ymin = 0
+    elif v > <double>(ny - 1):
+        ymin = ny - 1
+    else:
+        ymin = <Py_ssize_t>v
+
+    v = x2 + 0.5
+    if v > <double>(nx - 1):
+        xmax = nx - 1
+    elif v < 0.0:
+        xmax = 0
+    else:
+        xmax = <Py_ssize_t>v
+    if xmax < xmin:
+        xmax = xmin
+    v = y2 + 0.5
+    if v > <double>(ny - 1):
+        ymax = ny - 1
+    elif v < 0.0:
+        ymax = 0
+    else:
+        ymax = <Py_ssize_t>v
+    if ymax < ymin:
+        ymax = ymin
+
+    return xmin, xmax, ymin, ymax
@@ -1,3 +1,4 @@
+import functools
 import logging
 import warnings
 
@@ -10,10 +11,13 @@ from astropy.nddata.bitmask import (
 from astropy import units as u
 from spherical_geometry.polygon import SphericalPolygon  # type: ignore[import-untyped]
 
+from stcal.resample._utils import build_mask_u32, clip_bbox
+
 
 __all__ = [
     "build_driz_weight",
     "build_mask",
+    "build_mask_batch",
     "compute_mean_pixel_area",
     "get_tmeasure",
     "is_flux_density",
@@ -39,42 +43,117 @@ def resample_range(data_shape, bbox=None):
         if len(bbox) != 2:
             raise ValueError("Expected bounding box to be of length 2.")
         ((x1, x2), (y1, y2)) = bbox
-        xmin = max(0, int(x1 + 0.5))
-        ymin = max(0, int(y1 + 0.5))
-        xmax = max(xmin, min(data_shape[1] - 1, int(x2 + 0.5)))
-        ymax = max(ymin, min(data_shape[0] - 1, int(y2 + 0.5)))
+        # The rounding and clamping run in a C helper; validation and
+        # unpacking stay here so the ValueError paths are unchanged.
+        # Casting a non-finite double to an integer is undefined
+        # behavior in C, so reject such limits before dispatching.
+        if not np.all(np.isfinite([x1, x2, y1, y2])):
+            raise ValueError("Expected bounding box limits to be finite.")
+        xmin, xmax, ymin, ymax = clip_bbox(
+            data_shape[0], data_shape[1], x1, x2, y1, y2
+        )
 
     return xmin, xmax, ymin, ymax
 
 
+@functools.lru_cache(maxsize=128)
+def _interpret_bit_flags_cached(good_bits, flag_name_map):
+    return interpret_bit_flags(good_bits, flag_name_map=flag_name_map)
+
+
+def _resolve_good_bits(good_bits, flag_name_map):
+    """Resolve a good-bits specification to an integer (or None).
+
+    Pipelines loop over exposures with the same ``good_bits`` string, so
+    the pure-Python parse in ``interpret_bit_flags`` is memoized when
+    the arguments are hashable (e.g. a dict flag map or a list of flags
+    is not) and recomputed otherwise.
+    """
+    try:
+        return _interpret_bit_flags_cached(good_bits, flag_name_map)
+    except TypeError:
+        return interpret_bit_flags(good_bits, flag_name_map=flag_name_map)
+
+
 def build_mask(dqarr, good_bits, flag_name_map=None):
     """Build a bit mask from an input DQ array and a bitvalue flag
 
     In the returned bit mask, 1 is good, 0 is bad
     """
-    good_bits = interpret_bit_flags(good_bits, flag_name_map=flag_name_map)
+    good_bits = _resolve_good_bits(good_bits, flag_name_map)
+
+    if good_bits is None:
+        return np.ones(dqarr.shape, dtype=np.uint8)
+
+    dqarr = np.asarray(dqarr)
+
+    if dqarr.dtype == np.uint32:
+        # Production DQ arrays are uint32: use the fused C kernel, which
+        # makes one pass over the data with no intermediate arrays.
+        mask_inv = np.uint32(~np.uint32(good_bits & 0xFFFFFFFF))
+        return build_mask_u32(dqarr.ravel(), mask_inv).reshape(dqarr.shape)
+
+    # Other dtypes: a single fused comparison written straight into the
+    # uint8 output.  The complement is truncated to the DQ dtype width
+    # (and reinterpreted as signed for signed dtypes) so that good-bits
+    # values wider than the dtype do not hit NumPy 2 overflow errors.
+    if dqarr.dtype.kind in "iu":
+        nbits = 8 * dqarr.dtype.itemsize
+        mask_inv = ~good_bits & ((1 << nbits) - 1)
+        if dqarr.dtype.kind == "i" and mask_inv >= 1 << (nbits - 1):
+            mask_inv -= 1 << nbits
+        mask_inv = dqarr.dtype.type(mask_inv)
+    else:
+        mask_inv = ~good_bits
 
-    dqmask = bitfield_to_boolean_mask(
-        dqarr,
-        good_bits,
-        good_mask_value=1,
-        dtype=np.uint8,
-        flag_name_map=flag_name_map,
-    )
+    dqmask = np.empty(dqarr.shape, dtype=np.uint8)
+    np.equal(dqarr & mask_inv, 0, out=dqmask.view(bool))
     return dqmask
 
-    # if bitvalue is None:
-    #     return np.ones(dqarr.shape, dtype=np.uint8)
-    # return np.logical_not(np.bitwise_and(dqarr, ~bitvalue)).astype(np.uint8)
 
+def build_mask_batch(dqarr, good_bits_list, flag_name_map=None):
+    """Build bit masks for several good-bits specifications at once.
 
-    # bitvalue = interpret_bit_flags(bitvalue, mnemonic_map=pixel)
+    Each specification is resolved through ``interpret_bit_flags`` once
+    and all masks are then computed by a single broadcast expression
+    over the DQ array, so the per-call Python overhead of ``build_mask``
+    is paid once instead of once per specification.
 
-    # if bitvalue is None:
-    #     return np.ones(dqarr.shape, dtype=np.uint8)
+    Parameters
+    ----------
+    dqarr : ndarray
+        The input DQ array, shared by all specifications.
+
+    good_bits_list : list
+        A list of good-bits specifications, each in any form accepted
+        by ``build_mask``.
+
+    flag_name_map : astropy.nddata.BitFlagNameMap, dict, None, optional
+        Mapping from mnemonic bit flag names to integer bit values.
+
+    Returns
+    -------
+    masks : ndarray
+        A uint8 array of shape ``(len(good_bits_list),) + dqarr.shape``.
+        In each mask, 1 is good, 0 is bad.
+    """
+    dqarr = np.asarray(dqarr)
+
+    # A specification of None means everything is good, which is what a
+    # complement of zero produces below.
+    mask_inv = np.array(
+        [
+            0 if bits is None else ~np.uint32(bits & 0xFFFFFFFF)
+            for bits in (
+                _resolve_good_bits(good_bits, flag_name_map)
+                for good_bits in good_bits_list
+            )
+        ],
+        dtype=np.uint32,
+    )
 
-    # bitvalue = np.array(bitvalue).astype(dqarr.dtype)
-    # return np.logical_not(np.bitwise_and(dqarr, ~bitvalue)).astype(np.uint8)
+    masks = (dqarr.reshape(1, -1) & mask_inv[:, None]) == 0
+    return masks.astype(np.uint8).reshape(mask_inv.shape + dqarr.shape)
 
 
 def build_driz_weight(model, weight_type=None, good_bits=None,
@@ -157,21 +236,28 @@ def get_tmeasure(model):
 
     Returns a tuple of (exptime, is_measurement_time)
     """
-    try:
-        tmeasure = model["measurement_time"]
-    except KeyError:
-        return model["exposure_time"], False
+    tmeasure = model.get("measurement_time")
     if tmeasure is None:
         return model["exposure_time"], False
-    else:
-        return tmeasure, True
+    return tmeasure, True
 
 
 def is_imaging_wcs(wcs):
     """ Returns `True` if ``wcs`` is an imaging WCS and `False` otherwise. """
+    # Walking the frame attributes is pure-Python and this is called
+    # once per input image, so cache the answer on the WCS itself.
+    cached = getattr(wcs, "_stcal_is_imaging", None)
+    if cached is not None:
+        return cached
+
     imaging = all(
         ax == 'SPATIAL' for ax in wcs.output_frame.axes_type
     )
+    try:
+        wcs._stcal_is_imaging = imaging
+    except (AttributeError, TypeError):
+        # WCS types that forbid attribute assignment just recompute.
+        pass
     return imaging
 
 
@@ -6,6 +6,7 @@ import pytest
 from stcal.resample.utils import (
     build_driz_weight,
     build_mask,
+    build_mask_batch,
     compute_mean_pixel_area,
     get_tmeasure,
     is_flux_density,
@@ -16,7 +17,8 @@ from stcal.resample.utils import (
 from . helpers import make_input_model, JWST_DQ_FLAG_DEF
 
 GOOD = 0
-DQ = np.array([0, 1, 2, 3, 4, 5, 6, 7, 8])
+DQ = np.array([0, 1, 2, 3, 4, 5, 6, 7, 8], dtype=np.uint32)
+DQ_U32 = np.array([0, 1, 2**31, 2**31 + 1, 2**32 - 1], dtype=np.uint32)
 BITVALUES = 2**0 + 2**2
 BITVALUES_STR = f'{2**0}, {2**2}'
 BITVALUES_INV_STR = f'~{2**0}, {2**2}'
@@ -33,6 +35,8 @@ JWST_NAMES_INV = '~' + JWST_NAMES
         (DQ, JWST_NAMES, np.array([1, 1, 0, 0, 1, 1, 0, 0, 0])),
         (DQ, JWST_NAMES_INV, np.array([1, 0, 1, 0, 0, 0, 0, 0, 1])),
         (DQ, None, np.array([1, 1, 1, 1, 1, 1, 1, 1, 1])),
+        (DQ_U32, 2**31, np.array([1, 0, 1, 0, 0])),
+        (DQ.astype(np.int16), 2**16 + 8, np.array([1, 0, 0, 0, 0, 0, 0, 0, 1])),
     ]
 )
 def test_build_mask(dq, bitvalues, expected):
@@ -53,6 +57,38 @@ def test_build_mask(dq, bitvalues, expected):
     assert_array_equal(result, expected)
 
 
+@pytest.mark.parametrize("shape", [(2048, 2048)])
+def test_build_mask_large(shape):
+    """ Exercise the uint32 kernel path on a production-sized array """
+    dq = np.zeros(shape, dtype=np.uint32)
+    dq[0, 0] = JWST_DQ_FLAG_DEF.SATURATED
+
+    result = build_mask(dq, BITVALUES, flag_name_map=JWST_DQ_FLAG_DEF)
+    assert result.dtype == np.uint8
+    assert result.shape == shape
+    assert result[0, 0] == 0
+    assert result.sum() == dq.size - 1
+
+
+def test_build_mask_batch():
+    """ Test that all masks are built in one broadcast call """
+    bitvalues = [0, BITVALUES, BITVALUES_STR, BITVALUES_INV_STR,
+                 JWST_NAMES, JWST_NAMES_INV, None]
+    expected = np.array([
+        [1, 0, 0, 0, 0, 0, 0, 0, 0],
+        [1, 1, 0, 0, 1, 1, 0, 0, 0],
+        [1, 1, 0, 0, 1, 1, 0, 0, 0],
+        [1, 0, 1, 0, 0, 0, 0, 0, 1],
+        [1, 1, 0, 0, 1, 1, 0, 0, 0],
+        [1, 0, 1, 0, 0, 0, 0, 0, 1],
+        [1, 1, 1, 1, 1, 1, 1, 1, 1],
+    ])
+
+    result = build_mask_batch(DQ, bitvalues, flag_name_map=JWST_DQ_FLAG_DEF)
+    assert result.dtype == np.uint8
+    assert_array_equal(result, expected)
+
+
 @pytest.mark.parametrize(
     "data_shape, bbox, exception, truth",
     [
@@ -63,6 +99,9 @@ def test_build_mask(dq, bitvalues, expected):
         ((1000, 800), ((1, 500), ), True, None),
         ((1000, 800), ((1, 500), (0, 350), (0, 350)), True, None),
         ((1, ), ((1, 500), (0, 350)), True, None),
+        ((1200, 1400), ((np.nan, 300), (600, 800)), True, None),
+        ((1200, 1400), ((700, 300), (600, np.inf)), True, None),
+        ((1200, 1400), ((-1e30, 1e30), (-1e30, 1e30)), False, (0, 1399, 0, 1199)),
         ((1200, 1400), ((700, 300), (600, 800)), False, (700, 700, 600, 800)),
         ((1200, 1400), ((600, 800), (700, 300)), False, (600, 800, 700, 700)),
         ((1200, 1400), ((300, 700), (600, 800)), False, (300, 700, 600, 800)),